@@ -1,12 +1,19 @@
 import re
 import os
-import base64
 import io
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-import PyPDF2
+from openpyxl.worksheet.cell_range import CellRange
+import pypdf
 import eel # Import Eel library
+from gevent.threadpool import ThreadPoolExecutor
 
 # Try to import PyMuPDF with error handling for package conflicts
 try:
@@ -14,64 +21,232 @@ try:
     PYMUPDF_AVAILABLE = True
 except (ImportError, RuntimeError) as e:
     print(f"PyMuPDF import failed: {e}")
-    print("Falling back to PyPDF2 only")
+    print("Falling back to pypdf only")
     PYMUPDF_AVAILABLE = False
 
+# pybase64 has a SIMD-accelerated codec with the same API as the standard library
+try:
+    import pybase64 as base64_codec
+except ImportError:
+    import base64 as base64_codec
+
+# Line classification patterns, compiled once at import rather than per call
+# These stay on the standard re engine: every pattern is anchored and each
+# `.+` runs to the end of the line, so matching is linear already, and
+# RE2's Python binding costs more per call than it saves on short lines.
+# Level 1/2/3 headings and numbered list items share one pattern. The
+# alternatives never overlap (they differ in what follows the first run of
+# digits), so the named group that matched tells which kind of line it is.
+PATTERN_NUMBERED = re.compile(
+    r"^(?:(?P<level3>\d+\.\d+\.\d+(?:\s+.+)?)"
+    r"|(?P<level2>\d+\.\d+(?:\s+.+)?)"
+    r"|(?P<level1>\d+(?:\s+.+)?)"
+    r"|(?P<item_no>\d+)\.\s+(?P<item_desc>.+))$"
+)
+# Robust Regex for bullet points. Includes common unicode bullets and symbols.
+# Using `^[\s\u00A0]*` to match leading whitespace including non-breaking space
+# \u2022: Bullet (•), \u2023: Triangular Bullet (‣), \u25CF: Black Circle (●), \uF0B7: Wingdings bullet (), *: Asterisk, -: Hyphen, \u00B7: Middle Dot (·)
+PATTERN_BULLET_ITEM = re.compile(r"^[ \t]*[\u2022\u2023\u25CF\uF0B7\*\-\u00B7]\s*(.+)$", re.MULTILINE)
+BULLET_CHARS = frozenset("\u2022\u2023\u25CF\uF0B7*-\u00B7")
+
+# Layout of the generated sheet
+SHEET_TITLE = "App Store Features"
+HEADERS = ["Level 1 Heading", "Level 2 Heading", "Level 3 Heading", "List Item No.", "List Item Description"]
+ROW_KEYS = ('level1', 'level2', 'level3', 'item_no', 'item_desc')
+COLUMN_WIDTHS = [25, 30, 35, 8, 60]
+
+# Fixed parts of the .xlsx package written by write_excel_with_zipfile().
+# Style indexes used by the sheet: 1 = header, 2 = heading column, 3 = content column.
+XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">\
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>\
+<Default Extension="xml" ContentType="application/xml"/>\
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>\
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>\
+</Types>"""
+XLSX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>\
+</Relationships>"""
+XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">\
+<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets>\
+</workbook>"""
+XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>\
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>\
+</Relationships>"""
+XLSX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">\
+<fonts count="2">\
+<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>\
+<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>\
+</fonts>\
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>\
+<borders count="2">\
+<border><left/><right/><top/><bottom/><diagonal/></border>\
+<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>\
+</borders>\
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>\
+<cellXfs count="4">\
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>\
+<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="center" wrapText="1"/></xf>\
+<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="center" wrapText="1"/></xf>\
+<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1" applyAlignment="1"><alignment horizontal="left" vertical="top" wrapText="1"/></xf>\
+</cellXfs>\
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>\
+</styleSheet>"""
+XLSX_SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">\
+<sheetFormatPr defaultRowHeight="25" customHeight="1"/>\
+<cols>{cols}</cols>\
+<sheetData>"""
+XLSX_TEXT_CELL = '<c r="{ref}" s="{style}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+XLSX_EMPTY_CELL = '<c r="{ref}" s="{style}"/>'
+# Characters XML 1.0 cannot carry, plus a literal "_x0000_" lookalike, are
+# written with Excel's own _xHHHH_ escape
+XLSX_UNSAFE_TEXT = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]|_(?=x[0-9A-Fa-f]{4}_)")
+
+# Shared cell styles, built once and reused for every cell in the sheet
+BOLD = Font(bold=True)
+CENTER_WRAP = Alignment(horizontal='center', vertical='center', wrap_text=True)
+LEFT_TOP_WRAP = Alignment(horizontal='left', vertical='top', wrap_text=True)
+THIN = Side(style='thin')
+THIN_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+
 # Initialize Eel with the web folder (where your HTML, CSS, JS will be)
 # Make sure to create a folder named 'web' in the same directory as this Python script
 eel.init('web')
 
+# Eel serves the UI from a single gevent loop, so long-running work is handed
+# to native threads; waiting on the result yields to the loop instead of blocking it
+WORKER_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Results for the most recently converted PDFs, keyed by a digest of the
+# payload, so uploading the same file again skips decoding and parsing.
+# Only immutable strings are stored; the lock guards the worker threads.
+RESULT_CACHE_SIZE = 8
+result_cache = OrderedDict()
+result_cache_lock = threading.Lock()
+
+def payload_digest(pdf_data_base64):
+    """Short fingerprint of a base64 PDF payload, used as the cache key"""
+    return hashlib.blake2b(pdf_data_base64.encode('utf-8'), digest_size=16).hexdigest()
+
+def get_cached_result(key):
+    """Return the cached value for key (marking it recently used), or None"""
+    with result_cache_lock:
+        value = result_cache.get(key)
+        if value is not None:
+            result_cache.move_to_end(key)
+        return value
+
+def cache_result(key, value):
+    """Store a value, dropping the least recently used entries past the limit"""
+    with result_cache_lock:
+        result_cache[key] = value
+        result_cache.move_to_end(key)
+        while len(result_cache) > RESULT_CACHE_SIZE:
+            result_cache.popitem(last=False)
+
 @eel.expose # Expose this function to JavaScript
 def extract_text_from_pdf_eel(pdf_data_base64, method='auto'):
+    """
+    Extract text from PDF data (base64 string) on a worker thread.
+    Returns the extracted text.
+    """
+    return WORKER_POOL.submit(extract_text_from_pdf, pdf_data_base64, method).result()
+
+@eel.expose # Expose this function to JavaScript
+def parse_pdf_data_to_excel_eel(pdf_data_base64, original_filename=""):
+    """
+    Convert PDF data (base64 string) to Excel on a worker thread.
+    Returns the Excel file as a base64 string.
+    """
+    return WORKER_POOL.submit(parse_pdf_data_to_excel, pdf_data_base64, original_filename).result()
+
+def extract_text_from_pdf(pdf_data_base64, method='auto', cache_text=True):
     """
     Extract text from PDF file (received as base64 string) using different methods.
+    The Excel conversion passes cache_text=False, since it caches its own result.
     Returns the extracted text.
     """
-    text = ""
+    if cache_text:
+        cache_key = ('text', payload_digest(pdf_data_base64), method)
+        pdf_text = get_cached_result(cache_key)
+        if pdf_text is not None:
+            print("Using cached text for this PDF")
+            return pdf_text
+
     try:
         # Decode base64 PDF data to bytes
-        pdf_bytes = base64.b64decode(pdf_data_base64)
-        pdf_file = io.BytesIO(pdf_bytes) # Create a file-like object from bytes
+        pdf_bytes = base64_codec.b64decode(pdf_data_base64, validate=False)
+    except Exception as e:
+        print(f"Error decoding PDF data: {str(e)}")
+        raise Exception(f"Failed to extract text from PDF: {str(e)}")
+
+    pdf_text = extract_text_from_pdf_bytes(pdf_bytes, method)
+    if cache_text:
+        cache_result(cache_key, pdf_text)
+    return pdf_text
 
+def extract_text_from_pdf_bytes(pdf_bytes, method='auto'):
+    """
+    Extract text from already decoded PDF bytes using different methods.
+    The same bytes are reused if PyMuPDF fails and pypdf is tried instead.
+    Returns the extracted text.
+    """
+    parts = [] # Page texts, joined once at the end
+    try:
         # Auto-select method based on availability
         if method == 'auto':
-            method = 'pymupdf' if PYMUPDF_AVAILABLE else 'pypdf2'
+            method = 'pymupdf' if PYMUPDF_AVAILABLE else 'pypdf'
         
         if method == 'pymupdf' and PYMUPDF_AVAILABLE:
-            doc = fitz.open(stream=pdf_file.read(), filetype="pdf") # Use stream for PyMuPDF
-            for page_num in range(doc.page_count):
-                page = doc[page_num]
-                text += page.get_text()
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf") # PyMuPDF reads the bytes in place
+            page_count = doc.page_count # Read before closing the document
+            for page in doc:
+                # Plain text rather than get_text("blocks"): the text blocks join to
+                # the same string, and block geometry cannot tell a numbered heading
+                # from a list item, so the line parser has to classify lines anyway
+                parts.append(page.get_text())
             doc.close()
-            print(f"Extracted text using PyMuPDF from {doc.page_count} pages")
+            print(f"Extracted text using PyMuPDF from {page_count} pages")
             
-        elif method == 'pypdf2' or not PYMUPDF_AVAILABLE:
-            pdf_reader = PyPDF2.PdfReader(pdf_file) # PyPDF2 can directly use file-like object
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text()
-            print(f"Extracted text using PyPDF2 from {len(pdf_reader.pages)} pages")
+        elif method in ('pypdf', 'pypdf2') or not PYMUPDF_AVAILABLE:
+            # pypdf needs a seekable file-like object; BytesIO lets it use buffered reads
+            pdf_reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+            for page in pdf_reader.pages:
+                parts.append(page.extract_text() or "") # Pages without text may give None
+            print(f"Extracted text using pypdf from {len(pdf_reader.pages)} pages")
             
     except Exception as e:
         print(f"Error extracting text with {method}: {str(e)}")
         if method == 'pymupdf' and PYMUPDF_AVAILABLE:
-            print("Trying PyPDF2 as fallback in Eel...")
-            return extract_text_from_pdf_eel(pdf_data_base64, 'pypdf2')
+            print("Trying pypdf as fallback in Eel...")
+            return extract_text_from_pdf_bytes(pdf_bytes, 'pypdf')
         else:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
-    return text
+    return "".join(parts)
 
-@eel.expose # Expose this function to JavaScript
-def parse_pdf_data_to_excel_eel(pdf_data_base64, original_filename=""):
+def parse_pdf_data_to_excel(pdf_data_base64, original_filename=""):
     """
     Reads PDF data (as base64), extracts text, and creates Excel with merged cells.
     Returns the Excel file as a base64 string.
     """
     print(f"Processing PDF data for filename: {original_filename}")
+
+    digest = payload_digest(pdf_data_base64)
+    excel_base64 = get_cached_result(('excel', digest))
+    if excel_base64 is not None:
+        print("Using cached Excel file for this PDF")
+        return {"success": True, "excel_data_base64": excel_base64, "filename": original_filename}
     
     try:
-        pdf_text = extract_text_from_pdf_eel(pdf_data_base64, 'auto')
+        pdf_text = extract_text_from_pdf(pdf_data_base64, 'auto', cache_text=False)
     except Exception as e:
         print(f"Error extracting text in Eel: {e}")
         return {"error": str(e)} # Return error to JS
@@ -89,9 +264,13 @@ def parse_pdf_data_to_excel_eel(pdf_data_base64, original_filename=""):
     # This function is not exposed to Eel directly, it's called internally
     excel_buffer = parse_text_to_excel_with_merging(pdf_text, original_filename)
     
-    # Encode the Excel buffer to base64 for transfer to JavaScript
-    excel_base64 = base64.b64encode(excel_buffer.getvalue()).decode('utf-8')
+    # Encode the Excel buffer to base64 for transfer to JavaScript. getbuffer()
+    # is a view of the buffer, so the file bytes are not copied first, and
+    # base64 output is pure ASCII
+    with excel_buffer.getbuffer() as excel_bytes:
+        excel_base64 = base64_codec.b64encode(excel_bytes).decode('ascii')
     print("Excel file generated and encoded to base64.")
+    cache_result(('excel', digest), excel_base64)
     return {"success": True, "excel_data_base64": excel_base64, "filename": original_filename}
 
 
@@ -100,38 +279,21 @@ def parse_text_to_excel_with_merging(pdf_text, source_file=""):
     Parses PDF text and creates Excel with merged cells for better readability.
     Returns an in-memory BytesIO object containing the Excel file.
     """
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "App Store Features"
-
-    # Define the headers
-    headers = ["Level 1 Heading", "Level 2 Heading", "Level 3 Heading", "List Item No.", "List Item Description"]
-    sheet.append(headers)
-
-    # Style the headers
-    header_font = Font(bold=True, size=11)
-    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    for cell in sheet[1]:
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-    # Improved regex patterns with more flexibility
-    pattern_level1 = re.compile(r"^\s*(\d+(?:\s+.+)?)$", re.MULTILINE)
-    pattern_level2 = re.compile(r"^\s*(\d+\.\d+(?:\s+.+)?)$", re.MULTILINE)
-    pattern_level3 = re.compile(r"^\s*(\d+\.\d+\.\d+(?:\s+.+)?)$", re.MULTILINE)
-    pattern_list_item = re.compile(r"^\s*(\d+)\.\s+(.+)$", re.MULTILINE)
-    # Robust Regex for bullet points. Includes common unicode bullets and symbols.
-    # Using `^[\s\u00A0]*` to match leading whitespace including non-breaking space
-    # \u2022: Bullet (•), \u2023: Triangular Bullet (‣), \u25CF: Black Circle (●), \uF0B7: Wingdings bullet (), *: Asterisk, -: Hyphen, \u00B7: Middle Dot (·)
-    pattern_bullet_item = re.compile(r"^[ \t]*[\u2022\u2023\u25CF\uF0B7\*\-\u00B7]\s*(.+)$", re.MULTILINE)
-
-
     parsed_data = []
     current_level1 = ""
     current_level2 = ""
     current_level3 = ""
     current_list_item_buffer = None # This buffer will now hold details for either numbered or bulleted items
+    # Heading-only rows are held back: if the next row is a list item or a
+    # deeper heading, that row already carries these heading values
+    pending_heading = None # (level, row, len(parsed_data) when the heading was seen)
+
+    def add_heading_row(level, row):
+        """Emit the previous heading row if nothing since has carried it, then hold back this one"""
+        nonlocal pending_heading
+        if pending_heading and pending_heading[0] >= level and pending_heading[2] == len(parsed_data):
+            parsed_data.append(pending_heading[1])
+        pending_heading = (level, row, len(parsed_data))
 
     lines = pdf_text.split('\n')
     print(f"Processing {len(lines)} lines...")
@@ -153,102 +315,86 @@ def parse_text_to_excel_with_merging(pdf_text, source_file=""):
                     'level2': current_level2,
                     'level3': current_level3,
                     'item_no': current_list_item_buffer['number'], # 'number' could be actual number or bullet symbol
-                    'item_desc': current_list_item_buffer['description'].strip()
+                    'item_desc': " ".join(current_list_item_buffer['description']).strip()
                 })
                 current_list_item_buffer = None
             # print("Skipping empty line.")
             continue
 
-        match_level1 = pattern_level1.match(line)
-        match_level2 = pattern_level2.match(line)
-        match_level3 = pattern_level3.match(line)
-        match_list_item = pattern_list_item.match(line)
-        # Use raw_line for bullet item matching to preserve leading whitespace
-        match_bullet_item = pattern_bullet_item.match(raw_line) 
+        # Only lines starting with a digit or a bullet symbol can match anything,
+        # so the first character picks at most one regex to run
+        first_char = line[0]
+        match_numbered = match_bullet_item = None
+        if first_char in BULLET_CHARS:
+            # Use raw_line for bullet item matching to preserve leading whitespace
+            match_bullet_item = PATTERN_BULLET_ITEM.match(raw_line)
+        elif first_char.isdigit():
+            match_numbered = PATTERN_NUMBERED.match(line)
 
         # More detailed match output (removed for cleaner console during GUI operations)
-        # if match_level1: print(f"MATCH: Level 1 - '{match_level1.group(1)}'")
-        # elif match_level2: print(f"MATCH: Level 2 - '{match_level2.group(1)}'")
-        # elif match_level3: print(f"MATCH: Level 3 - '{match_level3.group(1)}'")
-        # elif match_list_item: print(f"MATCH: Numbered List Item - No:{match_list_item.group(1)}, Desc:'{match_list_item.group(2)}'")
+        # if match_numbered: print(f"MATCH: {match_numbered.groupdict()}")
         # elif match_bullet_item: print(f"MATCH: Bullet List Item - Desc:'{match_bullet_item.group(1)}'")
         # else: print("NO MATCH for any known pattern.")
 
+        if not (match_numbered or match_bullet_item):
+            # Plain text: continue the buffered list item, if any
+            if current_list_item_buffer:
+                current_list_item_buffer['description'].append(line)
+                # print(f"Continued list item: '{line}'")
+            # If there's no match and no buffer, the line is effectively skipped for parsing.
+            continue
+
+        numbered = match_numbered.groupdict() if match_numbered else {}
 
         # Finalize any buffered list item before processing a new heading or list item
-        if current_list_item_buffer and (match_level1 or match_level2 or match_level3 or match_list_item or match_bullet_item):
+        if current_list_item_buffer:
             parsed_data.append({
                 'level1': current_level1,
                 'level2': current_level2,
                 'level3': current_level3,
                 'item_no': current_list_item_buffer['number'],
-                'item_desc': current_list_item_buffer['description'].strip()
+                'item_desc': " ".join(current_list_item_buffer['description']).strip()
             })
             # print(f"Finalized buffered list item: {current_list_item_buffer['number']}")
             current_list_item_buffer = None
 
-        if match_level1:
-            current_level1 = match_level1.group(1)
+        if numbered.get('level1'):
+            current_level1 = numbered['level1']
             current_level2 = ""
             current_level3 = ""
-            parsed_data.append({
+            add_heading_row(1, {
                 'level1': current_level1, 'level2': '', 'level3': '',
                 'item_no': '', 'item_desc': ''
             })
             # print(f"Set L1: '{current_level1}'")
-        elif match_level2:
-            current_level2 = match_level2.group(1)
+        elif numbered.get('level2'):
+            current_level2 = numbered['level2']
             current_level3 = ""
-            parsed_data.append({
+            add_heading_row(2, {
                 'level1': current_level1, 'level2': current_level2, 'level3': '',
                 'item_no': '', 'item_desc': ''
             })
             # print(f"Set L2: '{current_level2}' (under L1: '{current_level1}')")
-        elif match_level3:
-            current_level3 = match_level3.group(1)
-            parsed_data.append({
+        elif numbered.get('level3'):
+            current_level3 = numbered['level3']
+            add_heading_row(3, {
                 'level1': current_level1, 'level2': current_level2, 'level3': current_level3,
                 'item_no': '', 'item_desc': ''
             })
             # print(f"Set L3: '{current_level3}' (under L1: '{current_level1}', L2: '{current_level2}')")
-        elif match_list_item:
-            # If a numbered list item starts, finalize any previous buffer
-            if current_list_item_buffer:
-                parsed_data.append({
-                    'level1': current_level1,
-                    'level2': current_level2,
-                    'level3': current_level3,
-                    'item_no': current_list_item_buffer['number'],
-                    'item_desc': current_list_item_buffer['description'].strip()
-                })
-                # print(f"Finalized previous buffered item before new numbered list: {current_list_item_buffer['number']}")
+        elif numbered.get('item_no'):
             current_list_item_buffer = {
-                'number': match_list_item.group(1), # This will be the actual number
-                'description': match_list_item.group(2)
+                'number': numbered['item_no'], # This will be the actual number
+                'description': [numbered['item_desc']] # Lines are joined once, when the item is finalized
             }
-            # print(f"Buffered numbered list item: No.{current_list_item_buffer['number']} Desc:'{current_list_item_buffer['description']}'")
+            # print(f"Buffered numbered list item: No.{current_list_item_buffer['number']} Desc:'{current_list_item_buffer['description'][0]}'")
         elif match_bullet_item: # NEW LOGIC FOR BULLET POINTS
-            # If a bullet point starts, finalize any previous buffer
-            if current_list_item_buffer:
-                parsed_data.append({
-                    'level1': current_level1,
-                    'level2': current_level2,
-                    'level3': current_level3,
-                    'item_no': current_list_item_buffer['number'],
-                    'item_desc': current_list_item_buffer['description'].strip()
-                })
-                # print(f"Finalized previous buffered item before new bullet list.")
             # For bullet points, we will use '•' as the item_no in the Excel
             current_list_item_buffer = {
                 'number': '•', # Special symbol for bullet points
-                'description': match_bullet_item.group(1)
+                'description': [match_bullet_item.group(1)]
             }
-            # print(f"Buffered bullet list item: Desc:'{current_list_item_buffer['description']}'")
-        else:
-            if current_list_item_buffer:
-                current_list_item_buffer['description'] += " " + line
-                # print(f"Continued list item: '{current_list_item_buffer['description']}'")
-            # If there's no match and no buffer, the line is effectively skipped for parsing.
+            # print(f"Buffered bullet list item: Desc:'{current_list_item_buffer['description'][0]}'")
 
 
     # Handle any remaining buffered list item after loop
@@ -258,127 +404,183 @@ def parse_text_to_excel_with_merging(pdf_text, source_file=""):
             'level2': current_level2,
             'level3': current_level3,
             'item_no': current_list_item_buffer['number'],
-            'item_desc': current_list_item_buffer['description'].strip()
+            'item_desc': " ".join(current_list_item_buffer['description']).strip()
         })
         # print(f"Finalized remaining buffered list item: {current_list_item_buffer['number']}")
 
-    print(f"Parsed {len(parsed_data)} data rows")
+    # A heading at the very end has no later row to carry it
+    if pending_heading and pending_heading[2] == len(parsed_data):
+        parsed_data.append(pending_heading[1])
 
-    # Write data to sheet
-    for row_data in parsed_data:
-        sheet.append([
-            row_data['level1'],
-            row_data['level2'],
-            row_data['level3'],
-            row_data['item_no'],
-            row_data['item_desc']
-        ])
-
-    # Merging function with improved error handling
-    def merge_consecutive_cells(column_index, sheet):
-        """Merge consecutive cells with the same content in a column"""
-        if sheet.max_row < 2:
-            return
-            
-        current_value = None
-        start_row = None
-        
-        for row_num in range(2, sheet.max_row + 1):
-            try:
-                cell_value = sheet.cell(row=row_num, column=column_index).value
-                
-                if cell_value and str(cell_value).strip():
-                    if current_value != cell_value:
-                        # End previous merge if exists
-                        if start_row and start_row < row_num - 1:
-                            merge_range = f"{get_column_letter(column_index)}{start_row}:{get_column_letter(column_index)}{row_num-1}"
-                            try:
-                                sheet.merge_cells(merge_range)
-                                merged_cell = sheet.cell(row=start_row, column=column_index)
-                                merged_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                                # print(f"Merged {merge_range}")
-                            except Exception as e:
-                                print(f"Error merging {merge_range}: {e}")
-                            
-                        current_value = cell_value
-                        start_row = row_num
-                else:
-                    if start_row and start_row < row_num - 1:
-                        merge_range = f"{get_column_letter(column_index)}{start_row}:{get_column_letter(column_index)}{row_num-1}"
-                        try:
-                            sheet.merge_cells(merge_range)
-                            merged_cell = sheet.cell(row=start_row, column=column_index)
-                            merged_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                            # print(f"Merged {merge_range}")
-                        except Exception as e:
-                            print(f"Error merging {merge_range}: {e}")
-                    
-                    current_value = None
-                    start_row = None
-            except Exception as e:
-                print(f"Error processing row {row_num}, column {column_index}: {e}")
-                continue
-        
-        # Handle final merge
-        if start_row and start_row < sheet.max_row:
-            merge_range = f"{get_column_letter(column_index)}{start_row}:{get_column_letter(column_index)}{sheet.max_row}"
-            try:
-                sheet.merge_cells(merge_range)
-                merged_cell = sheet.cell(row=start_row, column=column_index)
-                merged_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                # print(f"Final merge {merge_range}")
-            except Exception as e:
-                print(f"Error in final merge {merge_range}: {e}")
+    print(f"Parsed {len(parsed_data)} data rows")
 
     # Perform merging with error handling
     print("Starting merging process...")
     try:
-        merge_consecutive_cells(1, sheet)  # Level 1
-        merge_consecutive_cells(2, sheet)  # Level 2  
-        merge_consecutive_cells(3, sheet)  # Level 3
+        merge_ranges = find_merge_ranges(parsed_data)
     except Exception as e:
         print(f"Error during merging: {e}")
         print("Continuing without merging...")
+        merge_ranges = []
 
-    # Set column widths
-    column_widths = [25, 30, 35, 8, 60]
-    for i, width in enumerate(column_widths, start=1):
-        sheet.column_dimensions[get_column_letter(i)].width = width
+    try:
+        return write_excel_with_zipfile(parsed_data, merge_ranges)
+    except Exception as e:
+        print(f"Error writing Excel package directly: {e}")
+        print("Trying openpyxl as fallback...")
+    return write_excel_with_openpyxl(parsed_data, merge_ranges)
+
+def xlsx_text(value):
+    """Escape a cell value for the sheet XML"""
+    return XLSX_UNSAFE_TEXT.sub(lambda m: f"_x{ord(m.group()):04X}_", escape(value))
+
+def write_excel_with_zipfile(parsed_data, merge_ranges):
+    """
+    Writes the parsed rows and merged heading ranges straight into an .xlsx package.
+    The layout is fixed (five columns, three cell styles), so the sheet XML is
+    generated from string templates with inline strings and no shared string table.
+    Returns an in-memory BytesIO object containing the Excel file.
+    """
+    letters = [get_column_letter(col) for col in range(1, len(HEADERS) + 1)]
+    # Heading columns are centered, content columns are top-left aligned
+    column_styles = [2, 2, 2, 3, 3]
 
-    # Set row heights
-    for row in range(1, sheet.max_row + 1):
-        sheet.row_dimensions[row].height = 25
+    merged_away = set() # (row, column) pairs hidden under a merged range
+    for column_index, start_row, end_row in merge_ranges:
+        merged_away.update((row, column_index) for row in range(start_row + 1, end_row + 1))
 
-    # Apply formatting
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    cols = "".join(
+        f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>'
+        for i, width in enumerate(COLUMN_WIDTHS, start=1)
     )
-    
-    for row in range(1, sheet.max_row + 1):
-        for col in range(1, 6):
-            try:
-                cell = sheet.cell(row=row, column=col)
-                cell.border = thin_border
-                if row == 1:  # Header row
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                elif col <= 3:  # Heading columns
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                else:  # Content columns
-                    cell.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-            except Exception as e:
-                print(f"Error formatting cell {row},{col}: {e}")
-                continue
-    
+    parts = [XLSX_SHEET_START.format(cols=cols), '<row r="1">']
+    for letter, header in zip(letters, HEADERS):
+        parts.append(XLSX_TEXT_CELL.format(ref=f"{letter}1", style=1, text=xlsx_text(header)))
+    parts.append("</row>")
+
+    for row_num, row_data in enumerate(parsed_data, start=2):
+        parts.append(f'<row r="{row_num}">')
+        for col, (letter, key, style) in enumerate(zip(letters, ROW_KEYS, column_styles), start=1):
+            value = row_data[key]
+            if value and (row_num, col) not in merged_away:
+                parts.append(XLSX_TEXT_CELL.format(ref=f"{letter}{row_num}", style=style, text=xlsx_text(value)))
+            else:
+                parts.append(XLSX_EMPTY_CELL.format(ref=f"{letter}{row_num}", style=style))
+        parts.append("</row>")
+    parts.append("</sheetData>")
+
+    if merge_ranges:
+        parts.append(f'<mergeCells count="{len(merge_ranges)}">')
+        for column_index, start_row, end_row in merge_ranges:
+            letter = letters[column_index - 1]
+            parts.append(f'<mergeCell ref="{letter}{start_row}:{letter}{end_row}"/>')
+        parts.append("</mergeCells>")
+    parts.append("</worksheet>")
+
+    excel_buffer = io.BytesIO()
+    with zipfile.ZipFile(excel_buffer, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", XLSX_CONTENT_TYPES)
+        package.writestr("_rels/.rels", XLSX_ROOT_RELS)
+        package.writestr("xl/workbook.xml", XLSX_WORKBOOK.format(title=xlsx_text(SHEET_TITLE)))
+        package.writestr("xl/_rels/workbook.xml.rels", XLSX_WORKBOOK_RELS)
+        package.writestr("xl/styles.xml", XLSX_STYLES)
+        package.writestr("xl/worksheets/sheet1.xml", "".join(parts))
+    excel_buffer.seek(0) # Rewind the buffer to the beginning
+    return excel_buffer
+
+def write_excel_with_openpyxl(parsed_data, merge_ranges):
+    """
+    Writes the parsed rows and merged heading ranges with openpyxl.
+    Returns an in-memory BytesIO object containing the Excel file.
+    """
+    # Write-only mode streams rows straight to the file, so everything that
+    # depends on the data (merges, dimensions) is set up before writing
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_TITLE)
+
+    merged_away = set() # (row, column) pairs hidden under a merged range
+    for column_index, start_row, end_row in merge_ranges:
+        sheet.merged_cells.ranges.add(CellRange(
+            min_col=column_index, min_row=start_row,
+            max_col=column_index, max_row=end_row
+        ))
+        merged_away.update((row, column_index) for row in range(start_row + 1, end_row + 1))
+
+    # Set column widths (must happen before the first row is streamed)
+    for i, width in enumerate(COLUMN_WIDTHS, start=1):
+        sheet.column_dimensions[get_column_letter(i)].width = width
+
+    # One default height for every row instead of a dimension entry per row;
+    # customHeight tells Excel to use it rather than autofit each row
+    sheet.sheet_format.defaultRowHeight = 25
+    sheet.sheet_format.customHeight = True
+
+    # Register the cell styles once; cells then refer to them by name
+    workbook.add_named_style(NamedStyle(name="header_style", font=BOLD, alignment=CENTER_WRAP, border=THIN_BORDER))
+    workbook.add_named_style(NamedStyle(name="heading_style", alignment=CENTER_WRAP, border=THIN_BORDER))
+    workbook.add_named_style(NamedStyle(name="content_style", alignment=LEFT_TOP_WRAP, border=THIN_BORDER))
+    # Heading columns are centered, content columns are top-left aligned
+    column_styles = ["heading_style"] * 3 + ["content_style"] * 2
+
+    def styled_cell(value, style):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.style = style
+        return cell
+
+    # Write the header row
+    sheet.append([styled_cell(header, "header_style") for header in HEADERS])
+
+    # Write data to sheet
+    for row_num, row_data in enumerate(parsed_data, start=2):
+        row = []
+        for col, (key, style) in enumerate(zip(ROW_KEYS, column_styles), start=1):
+            value = None if (row_num, col) in merged_away else row_data[key]
+            row.append(styled_cell(value, style))
+        sheet.append(row)
+
     # Save the workbook to an in-memory BytesIO object instead of a file
     excel_buffer = io.BytesIO()
     workbook.save(excel_buffer)
     excel_buffer.seek(0) # Rewind the buffer to the beginning
     return excel_buffer
 
+def find_merge_ranges(parsed_data, keys=('level1', 'level2', 'level3')):
+    """
+    Finds runs of consecutive rows with the same heading in one pass over parsed_data.
+    Returns (column_index, start_row, end_row) tuples, with data rows starting at sheet row 2.
+    """
+    merge_ranges = []
+    current_values = [None] * len(keys)
+    start_rows = [None] * len(keys)
+
+    for row_num, row_data in enumerate(parsed_data, start=2):
+        for i, key in enumerate(keys):
+            # Headings are stored already stripped, and '' when not set
+            cell_value = row_data[key]
+
+            if cell_value:
+                if current_values[i] == cell_value:
+                    continue
+                new_start = row_num
+            else:
+                cell_value = None
+                new_start = None
+
+            # End previous merge if exists
+            if start_rows[i] and start_rows[i] < row_num - 1:
+                merge_ranges.append((i + 1, start_rows[i], row_num - 1))
+
+            current_values[i] = cell_value
+            start_rows[i] = new_start
+
+    # Handle final merge
+    last_row = len(parsed_data) + 1
+    for i, start_row in enumerate(start_rows):
+        if start_row and start_row < last_row:
+            merge_ranges.append((i + 1, start_row, last_row))
+
+    return merge_ranges
+
 if __name__ == "__main__":
     # Start the Eel application
     # The 'index.html' file should be in a 'web' subfolder